@@ -2,9 +2,8 @@
 
 import asyncio
 import os
-from typing import Any
 
-from agent_framework import ChatMessage, ConcurrentBuilder
+from agent_framework import ChatMessage, Role
 from agent_framework.azure import AzureOpenAIChatClient
 from azure.identity import AzureCliCredential
 from dotenv import load_dotenv
@@ -17,21 +16,18 @@ api_key=os.getenv("AZURE_OPENAI_API_KEY")
 
 
 """
-Sample: Concurrent fan-out/fan-in (agent-only API) with default aggregator
+Sample: Concurrent fan-out/fan-in with asyncio.gather
 
-Build a high-level concurrent workflow using ConcurrentBuilder and three domain agents.
-The default dispatcher fans out the same user prompt to all agents in parallel.
-The default aggregator fans in their results and yields output containing
-a list[ChatMessage] representing the concatenated conversations from all agents.
+Fan out the same user prompt to three domain agents with asyncio.gather so all
+requests are dispatched at the same time, then fan in their replies into a
+single list[ChatMessage] conversation.
 
 Demonstrates:
-- Minimal wiring with ConcurrentBuilder().participants([...]).build()
-- Fan-out to multiple agents, fan-in aggregation of final ChatMessages
-- Workflow completion when idle with no pending work
+- Explicit parallel dispatch with asyncio.gather over agent.run
+- Manual fan-in aggregation of final ChatMessages
 
 Prerequisites:
 - Azure OpenAI access configured for AzureOpenAIChatClient (use az login + env vars)
-- Familiarity with Workflow events (AgentRunEvent, WorkflowOutputEvent)
 """
 
 
@@ -66,21 +62,22 @@ async def main() -> None:
         name="legal",
     )
 
-    # 2) Build a concurrent workflow
-    # Participants are either Agents (type of AgentProtocol) or Executors
-    workflow = ConcurrentBuilder().participants([researcher, marketer, legal]).build()
-
-    # 3) Run with a single prompt and pretty-print the final combined messages
-    events = await workflow.run("We are launching a new budget-friendly electric bike for urban commuters.")
-    outputs = events.get_outputs()
-
-    if outputs:
-        print("===== Final Aggregated Conversation (messages) =====")
-        for output in outputs:
-            messages: list[ChatMessage] | Any = output
-            for i, msg in enumerate(messages, start=1):
-                name = msg.author_name if msg.author_name else "user"
-                print(f"{'-' * 60}\n\n{i:02d} [{name}]:\n{msg.text}")
+    # 2) Fan out the same prompt to all agents in parallel
+    prompt = "We are launching a new budget-friendly electric bike for urban commuters."
+    agents = [researcher, marketer, legal]
+    results = await asyncio.gather(*(agent.run(prompt) for agent in agents))
+
+    # 3) Fan in: the user prompt followed by each agent's reply, then pretty-print
+    messages: list[ChatMessage] = [ChatMessage(role=Role.USER, text=prompt)]
+    for agent, result in zip(agents, results):
+        for msg in result.messages:
+            msg.author_name = msg.author_name or agent.name
+            messages.append(msg)
+
+    print("===== Final Aggregated Conversation (messages) =====")
+    for i, msg in enumerate(messages, start=1):
+        name = msg.author_name if msg.author_name else "user"
+        print(f"{'-' * 60}\n\n{i:02d} [{name}]:\n{msg.text}")
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
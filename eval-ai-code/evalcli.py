@@ -5,8 +5,10 @@ A tool to evaluate code files and determine the likelihood they were generated b
 """
 
 import os
-from services.ADOService import download_pr_changes
+from services.ADOService import download_pr_changes_async
 from services.CodeEvaluatorService import AICodeEvaluator, print_results
+from services.EvaluationCache import EvaluationCache
+from services.RateLimiter import RateLimiter
 import click
 from pathlib import Path
 from typing import List, Dict, Tuple
@@ -15,12 +17,39 @@ from dataclasses import dataclass
 from dotenv import load_dotenv
 load_dotenv()  # Load environment variables from .env file if present
 
-async def run_evaluation(exclude_ext: tuple = (), exclude_folder: tuple = (), folder: Path = Path('.')):
+async def evaluate_pr(evaluator: AICodeEvaluator, pr_url: str, deployment_name: str, exclude_extensions: set, exclude_folders_set: set, no_cache: bool, concurrency: int):
+    """Evaluate the files of a PR as they finish downloading."""
+    files: asyncio.Queue = asyncio.Queue()
+
+    def on_file(path: Path, name: str, size: int):
+        if evaluator.should_evaluate(name, size, exclude_extensions, exclude_folders_set):
+            files.put_nowait((path, name, size))
+
+    async def download():
+        try:
+            await download_pr_changes_async(pr_url, use_cache=not no_cache, on_file=on_file)
+        finally:
+            # Let the evaluation finish the files it has, or stop if the download failed
+            files.put_nowait(None)
+
+    try:
+        async with asyncio.TaskGroup() as tasks:
+            tasks.create_task(download())
+            evaluation = tasks.create_task(evaluator.evaluate_files(files, deployment_name, concurrency))
+    except ExceptionGroup as e:
+        # Report the error that stopped the run rather than the group wrapping it
+        raise e.exceptions[0] from None
+    return evaluation.result()
+
+
+async def run_evaluation(exclude_ext: tuple = (), exclude_folder: tuple = (), folder: Path = Path('.'), no_cache: bool = False, concurrency: int = 5, prefilter: bool = False, pr_url: str = None):
     try:
         azure_endpoint = os.getenv('AZURE_OPENAI_ENDPOINT')
         api_key = os.getenv('AZURE_OPENAI_API_KEY')
         deployment_name = os.getenv('AZURE_OPENAI_DEPLOYMENT_NAME')
-        api_version = os.getenv('AZURE_OPENAI_API_VERSION', '2024-02-15-preview')
+        api_version = os.getenv('AZURE_OPENAI_API_VERSION', '2024-10-21')
+        requests_per_minute = os.getenv('AZURE_OPENAI_RPM')
+        tokens_per_minute = os.getenv('AZURE_OPENAI_TPM')
 
         # Convert tuples to sets and normalize extensions
         exclude_extensions = set()
@@ -33,8 +62,19 @@ async def run_evaluation(exclude_ext: tuple = (), exclude_folder: tuple = (), fo
         
         exclude_folders_set = set(exclude_folder) if exclude_folder else None
 
-        evaluator = AICodeEvaluator(azure_endpoint, api_key, api_version)
-        evaluation = await evaluator.evaluate_folder(folder, deployment_name, exclude_extensions, exclude_folders_set)
+        cache = None if no_cache else EvaluationCache()
+        rate_limiter = RateLimiter(
+            int(requests_per_minute) if requests_per_minute else None,
+            int(tokens_per_minute) if tokens_per_minute else None
+        )
+        evaluator = AICodeEvaluator(azure_endpoint, api_key, api_version, cache, rate_limiter, prefilter)
+        try:
+            if pr_url:
+                evaluation = await evaluate_pr(evaluator, pr_url, deployment_name, exclude_extensions, exclude_folders_set, no_cache, concurrency)
+            else:
+                evaluation = await evaluator.evaluate_folder(folder, deployment_name, exclude_extensions, exclude_folders_set, concurrency)
+        finally:
+            await evaluator.close()
         print_results(evaluation)
         
     except Exception as e:
@@ -53,7 +93,10 @@ def cli():
 @click.argument('folder', type=click.Path(exists=True, file_okay=False, dir_okay=True, path_type=Path))
 @click.option('--exclude-ext', multiple=True, help='File extensions to exclude (e.g., --exclude-ext .py --exclude-ext .js)')
 @click.option('--exclude-folder', multiple=True, help='Folder names to exclude (e.g., --exclude-folder tests --exclude-folder docs)')
-def eval_folder(folder: Path, exclude_ext: tuple, exclude_folder: tuple):
+@click.option('--no-cache', is_flag=True, help='Re-evaluate every file instead of reusing cached results')
+@click.option('--concurrency', default=5, show_default=True, type=click.IntRange(min=1), help='Maximum number of concurrent Azure OpenAI requests')
+@click.option('--prefilter', is_flag=True, help='Score files locally as AI-generated, without calling Azure OpenAI, when style heuristics strongly suggest it')
+def eval_folder(folder: Path, exclude_ext: tuple, exclude_folder: tuple, no_cache: bool, concurrency: int, prefilter: bool):
     """
     Evaluate code files in a folder to determine likelihood of AI generation.
     
@@ -63,21 +106,23 @@ def eval_folder(folder: Path, exclude_ext: tuple, exclude_folder: tuple):
     
     # Run the async function
     if folder:
-        asyncio.run(run_evaluation(exclude_ext=exclude_ext, exclude_folder=exclude_folder, folder=folder))
+        asyncio.run(run_evaluation(exclude_ext=exclude_ext, exclude_folder=exclude_folder, folder=folder, no_cache=no_cache, concurrency=concurrency, prefilter=prefilter))
 
 
 @cli.command()
 @click.option('--pr-url', required=True, help='Azure DevOps Pull Request URL')
 @click.option('--exclude-ext', multiple=True, help='File extensions to exclude (e.g., --exclude-ext .py --exclude-ext .js)')
 @click.option('--exclude-folder', multiple=True, help='Folder names to exclude (e.g., --exclude-folder tests --exclude-folder docs)')
-def eval_pr(pr_url, exclude_ext, exclude_folder):
+@click.option('--no-cache', is_flag=True, help='Re-download the PR and re-evaluate every file instead of reusing cached results')
+@click.option('--concurrency', default=5, show_default=True, type=click.IntRange(min=1), help='Maximum number of concurrent Azure OpenAI requests')
+@click.option('--prefilter', is_flag=True, help='Score files locally as AI-generated, without calling Azure OpenAI, when style heuristics strongly suggest it')
+def eval_pr(pr_url, exclude_ext, exclude_folder, no_cache, concurrency, prefilter):
     """Evaluate the files in a PR."""
     click.echo(f"Evaluating PR: {pr_url}")
-    folder = download_pr_changes(pr_url)
 
-    # Run the async function
-    if folder:
-        asyncio.run(run_evaluation(exclude_ext=exclude_ext, exclude_folder=exclude_folder, folder=folder))
+    # Download and evaluation share one event loop
+    asyncio.run(run_evaluation(exclude_ext=exclude_ext, exclude_folder=exclude_folder, no_cache=no_cache, concurrency=concurrency, prefilter=prefilter, pr_url=pr_url))
+
 
 if __name__ == '__main__':
     cli()
\ No newline at end of file
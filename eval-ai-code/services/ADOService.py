@@ -1,20 +1,181 @@
+import asyncio
+import hashlib
 import os
+import shutil
 import tempfile
+import time
+import aiofiles
+import aiohttp
 from azure.devops.connection import Connection
 from msrest.authentication import BasicAuthentication
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
 from urllib.parse import urlparse, parse_qs
 
-def download_pr_changes(pr_url, pat_token=None)-> str:
+# Azure DevOps REST API version used for item downloads
+ADO_API_VERSION = '7.1'
+
+# Maximum number of files downloaded at the same time
+MAX_CONCURRENT_DOWNLOADS = 16
+
+# Size of the chunks streamed from the response to disk
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Downloaded PRs are kept here, one folder per PR iteration and source commit
+PR_CACHE_DIR = Path.home() / '.cache' / 'ado-pr'
+
+# Disk space the cached PRs may use before the least recently used ones are removed
+PR_CACHE_SIZE_LIMIT = 1024 * 1024 * 1024
+
+# Incomplete cache folders older than this were left behind by a run that was killed
+STALE_DOWNLOAD_SECONDS = 60 * 60
+
+# Called with the local path, the '/'-separated path relative to the PR folder and the
+# size in bytes of each file, as soon as it is on disk
+FileCallback = Callable[[Path, str, int], None]
+
+# Written last into a cached PR folder; its presence means the download completed.
+# It holds the folder size in bytes, and its mtime records when the PR was last used.
+COMPLETE_MARKER = '.complete'
+
+
+def _get_git_client(organization, pat_token):
+    """Create an Azure DevOps Git client for an organization."""
+    # Create connection to Azure DevOps
+    credentials = BasicAuthentication('', pat_token)
+    connection = Connection(base_url=f'https://dev.azure.com/{organization}', creds=credentials)
+    
+    # Get clients
+    return connection.clients.get_git_client()
+
+
+async def _download_item(session: aiohttp.ClientSession, items_url: str, file_path: str, commit_id: str, folder: str, on_file: Optional[FileCallback] = None) -> int:
+    """Download one file at the given commit into the folder and return its size in bytes."""
+    params = {
+        'path': file_path,
+        'versionDescriptor.version': commit_id,
+        'versionDescriptor.versionType': 'commit',
+        '$format': 'octetStream',
+        'api-version': ADO_API_VERSION,
+    }
+    # Create directory structure in the folder
+    full_path = os.path.join(folder, file_path.lstrip('/'))
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+
+    size = 0
+    async with session.get(items_url, params=params) as response:
+        response.raise_for_status()
+        # Stream the body to disk so memory stays bounded by the chunk size
+        async with aiofiles.open(full_path, 'wb') as f:
+            async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                await f.write(chunk)
+                size += len(chunk)
+    if on_file:
+        on_file(Path(full_path), file_path.lstrip('/'), size)
+    return size
+
+
+async def _download_items(items_url: str, pat_token: str, file_paths: List[str], commit_id: str, folder: str, on_file: Optional[FileCallback] = None) -> int:
+    """Download files concurrently into the folder, removing it if any download fails. Returns the total size in bytes."""
+    connector = aiohttp.TCPConnector(limit=MAX_CONCURRENT_DOWNLOADS)
+    try:
+        async with aiohttp.ClientSession(auth=aiohttp.BasicAuth('', pat_token), connector=connector) as session:
+            # A failed download cancels the others, so nothing still writes into the folder being removed
+            async with asyncio.TaskGroup() as downloads:
+                tasks = [downloads.create_task(_download_item(session, items_url, file_path, commit_id, folder, on_file))
+                         for file_path in file_paths]
+    except BaseException as e:
+        shutil.rmtree(folder, ignore_errors=True)
+        # Report the download that failed rather than the group wrapping it
+        if isinstance(e, ExceptionGroup):
+            raise e.exceptions[0] from None
+        raise
+    return sum(task.result() for task in tasks)
+
+
+def _list_files(folder: str) -> List[Tuple[Path, str, int]]:
+    """List the files of a downloaded PR folder as (path, relative path, size) tuples."""
+    files = []
+    for root, _, names in os.walk(folder):
+        for name in names:
+            path = os.path.join(root, name)
+            relative_path = os.path.relpath(path, folder).replace(os.sep, '/')
+            if relative_path != COMPLETE_MARKER:
+                files.append((Path(path), relative_path, os.path.getsize(path)))
+    return files
+
+
+def _claim_cache_dir(cache_dir: Path) -> Optional[Path]:
+    """Create the cache folder of a PR for this run, or return None while another run is filling it."""
+    PR_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    try:
+        cache_dir.mkdir()
+        return cache_dir
+    except FileExistsError:
+        pass
+
+    # A folder without the marker that has not changed for a long time was left by a killed run
+    if time.time() - cache_dir.stat().st_mtime < STALE_DOWNLOAD_SECONDS:
+        return None
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    try:
+        cache_dir.mkdir()
+        return cache_dir
+    except FileExistsError:
+        return None
+
+
+def _prune_pr_cache(keep: Path):
+    """Remove stale incomplete downloads, then the least recently used PRs until the cache fits PR_CACHE_SIZE_LIMIT."""
+    now = time.time()
+    complete = []
+    total_size = 0
+    with os.scandir(PR_CACHE_DIR) as entries:
+        for entry in entries:
+            if not entry.is_dir(follow_symlinks=False):
+                continue
+            marker = os.path.join(entry.path, COMPLETE_MARKER)
+            try:
+                last_used = os.stat(marker).st_mtime
+                with open(marker) as f:
+                    size = int(f.read() or 0)
+            except (OSError, ValueError):
+                # Still being downloaded by another run, or left behind by a killed one
+                if now - entry.stat().st_mtime > STALE_DOWNLOAD_SECONDS:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                continue
+            total_size += size
+            if entry.path != str(keep):
+                complete.append((last_used, size, entry.path))
+
+    for _, size, path in sorted(complete):
+        if total_size <= PR_CACHE_SIZE_LIMIT:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total_size -= size
+
+
+async def download_pr_changes_async(pr_url, pat_token=None, use_cache=True, on_file: Optional[FileCallback] = None) -> str:
     """
-    Download modified code from a PR to a temporary folder maintaining file structure.
+    Download modified code from a PR to a local folder maintaining file structure.
+    Files are taken from the source commit of the PR's latest iteration and are all
+    downloaded concurrently; if one fails, the others are cancelled. Unless use_cache
+    is False, the folder is kept under ~/.cache/ado-pr/ and reused until the PR gets
+    a new iteration, with the least recently used PRs removed beyond PR_CACHE_SIZE_LIMIT.
     
     Args:
         pr_url (str): Azure DevOps PR URL
-        pat_token (str): Personal Access Token
+        pat_token (str): Personal Access Token, defaults to the AZURE_DEVOPS_PAT environment variable
+        use_cache (bool): Reuse a previous download of the same PR iteration and commit
+        on_file (callable): Called for each file as soon as it is on disk, with its path,
+            its path relative to the folder and its size, so it can be processed while
+            the rest of the PR downloads. Files of a cached PR are all reported at once.
     
     Returns:
-        str: Path to temporary folder containing the changes
+        str: Path to folder containing the changes
     """
+    pat_token = pat_token or os.getenv('AZURE_DEVOPS_PAT', '')
+
     # Parse PR URL to extract organization, project, repo, and PR ID
     parsed_url = urlparse(pr_url)
     path_parts = parsed_url.path.strip('/').split('/')
@@ -23,47 +184,68 @@ def download_pr_changes(pr_url, pat_token=None)-> str:
     project = path_parts[0]
     repo_name = path_parts[2]
     pr_id = int(path_parts[4])
+
+    # The azure-devops client is synchronous, keep it off the event loop
+    git_client = await asyncio.to_thread(_get_git_client, organization, pat_token)
     
-    # Create connection to Azure DevOps
-    credentials = BasicAuthentication('', pat_token)
-    connection = Connection(base_url=f'https://dev.azure.com/{organization}', creds=credentials)
-    
-    # Get clients
-    git_client = connection.clients.get_git_client()
-    
-    # Get PR details
-    pr = git_client.get_pull_request(repository_id=repo_name, pull_request_id=pr_id, project=project)
+    # The latest iteration lists every file changed so far, and its source commit pins
+    # their content even if the branch moves on or is deleted
+    iterations = await asyncio.to_thread(git_client.get_pull_request_iterations, repository_id=repo_name, pull_request_id=pr_id, project=project)
+    iteration = max(iterations, key=lambda iteration: iteration.id)
+    source_commit = iteration.source_ref_commit.commit_id
+
+    # Return the earlier download if nothing changed since
+    cache_dir = None
+    if use_cache:
+        key = hashlib.sha1(f"{organization}/{project}/{repo_name}:{pr_id}:{iteration.id}:{source_commit}".encode()).hexdigest()
+        marker = PR_CACHE_DIR / key / COMPLETE_MARKER
+        if marker.exists():
+            # Record the use so pruning removes the least recently used PRs first
+            os.utime(marker)
+            if on_file:
+                for file in await asyncio.to_thread(_list_files, str(marker.parent)):
+                    on_file(*file)
+            return str(marker.parent)
+        cache_dir = await asyncio.to_thread(_claim_cache_dir, PR_CACHE_DIR / key)
     
     # Get PR changes
-    changes = git_client.get_pull_request_iteration_changes(
+    changes = await asyncio.to_thread(
+        git_client.get_pull_request_iteration_changes,
         repository_id=repo_name, 
         pull_request_id=pr_id, 
-        iteration_id=1,
+        iteration_id=iteration.id,
         project=project
     )
+    file_paths = [change.item.path for change in changes.change_entries if change.change_type in ['add', 'edit']]
     
-    # Create temporary directory
-    temp_dir = tempfile.mkdtemp()
+    # Download straight into the claimed cache folder; it only counts as cached once the
+    # marker is written. Without caching, or while another run is downloading the same
+    # PR, use a temporary directory instead.
+    folder = str(cache_dir) if cache_dir else tempfile.mkdtemp()
     
     # Download modified files
-    for change in changes.change_entries:
-        if change.change_type in ['add', 'edit']:
-            file_path = change.item.path
-            
-            # Get file content from the source branch
-            file_content = git_client.get_item_content(
-                repository_id=repo_name,
-                path=file_path,
-                version_descriptor={'version': pr.source_ref_name, 'version_type': 'branch'},
-                project=project
-            )
-            
-            # Create directory structure in temp folder
-            full_path = os.path.join(temp_dir, file_path.lstrip('/'))
-            os.makedirs(os.path.dirname(full_path), exist_ok=True)
-            
-            # Write file content
-            with open(full_path, 'wb') as f:
-                f.write(file_content)
+    items_url = f'https://dev.azure.com/{organization}/{project}/_apis/git/repositories/{repo_name}/items'
+    size = await _download_items(items_url, pat_token, file_paths, source_commit, folder, on_file)
+
+    if cache_dir:
+        with open(os.path.join(folder, COMPLETE_MARKER), 'w') as f:
+            f.write(str(size))
+        await asyncio.to_thread(_prune_pr_cache, cache_dir)
+    
+    return folder
+
+
+def download_pr_changes(pr_url, pat_token=None, use_cache=True) -> str:
+    """
+    Download modified code from a PR to a local folder maintaining file structure.
+    Synchronous wrapper around download_pr_changes_async.
     
-    return temp_dir
\ No newline at end of file
+    Args:
+        pr_url (str): Azure DevOps PR URL
+        pat_token (str): Personal Access Token
+        use_cache (bool): Reuse a previous download of the same PR iteration and commit
+    
+    Returns:
+        str: Path to folder containing the changes
+    """
+    return asyncio.run(download_pr_changes_async(pr_url, pat_token, use_cache))
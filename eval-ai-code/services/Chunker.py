@@ -0,0 +1,52 @@
+import zlib
+from typing import Iterator, List
+
+# Chunk size bounds in characters
+MIN_CHUNK_SIZE = 512
+AVG_CHUNK_SIZE = 2048
+MAX_CHUNK_SIZE = 8192
+
+# Typical line length of source code, used to turn the target size into a per-line cut probability
+_AVG_LINE_LENGTH = 40
+
+
+def _split_lines(content: str, max_size: int) -> Iterator[str]:
+    """Yield the lines of the text, hard-splitting any line longer than `max_size` into `max_size` pieces."""
+    for line in content.splitlines(keepends=True):
+        if len(line) <= max_size:
+            yield line
+        else:
+            for start in range(0, len(line), max_size):
+                yield line[start:start + max_size]
+
+
+def chunk_content(content: str, min_size: int = MIN_CHUNK_SIZE, avg_size: int = AVG_CHUNK_SIZE,
+                  max_size: int = MAX_CHUNK_SIZE) -> List[str]:
+    """
+    Split text into content-defined chunks aligned to line boundaries.
+
+    A chunk ends after a line whose hash hits the cut condition once the chunk holds
+    at least `min_size` characters, or as soon as the next line would exceed `max_size`.
+    Lines longer than `max_size` (e.g. minified code) are split into `max_size` pieces first.
+    Because cut points depend on the lines themselves rather than on fixed offsets,
+    an edit only changes the chunks around it and the others keep their exact content.
+    """
+    divisor = max(1, (avg_size - min_size) // _AVG_LINE_LENGTH)
+    chunks = []
+    current: List[str] = []
+    size = 0
+
+    for line in _split_lines(content, max_size):
+        if current and size + len(line) > max_size:
+            chunks.append("".join(current))
+            current, size = [], 0
+        current.append(line)
+        size += len(line)
+        # crc32 rather than hash(): cut points must be stable across runs
+        if size >= min_size and zlib.crc32(line.encode('utf-8', 'ignore')) % divisor == 0:
+            chunks.append("".join(current))
+            current, size = [], 0
+
+    if current:
+        chunks.append("".join(current))
+    return chunks
@@ -1,11 +1,19 @@
+from array import array
+from collections import Counter
 from dataclasses import dataclass
-from openai import AsyncAzureOpenAI
-import aiofiles
+from openai import APIConnectionError, AsyncAzureOpenAI, InternalServerError, RateLimitError
+import httpx
 import asyncio
+import contextlib
 import json
+import os
 import click
 from pathlib import Path
-from typing import List, Set
+from typing import List, Optional, Set, Tuple, Union
+from services.Chunker import chunk_content
+from services.EvaluationCache import EvaluationCache
+from services.HeuristicFilter import heuristic_evaluation
+from services.RateLimiter import RateLimiter, estimate_tokens
 
 
 @dataclass
@@ -17,13 +25,77 @@ class FileEvaluation:
     file_type: str
 
 
-@dataclass
+class EvaluationBatch:
+    """Evaluation results stored column-wise: one array per field instead of one object per file."""
+
+    def __init__(self, size: int = 0):
+        """Pre-size the columns for `size` results."""
+        self.scores = array('b', bytes(size))
+        self.filenames: List[str] = [''] * size
+        self.reasons: List[str] = [''] * size
+        self.file_types: List[str] = [''] * size
+        self._count = 0
+
+    @classmethod
+    def from_evaluations(cls, file_evaluations: List[FileEvaluation]) -> 'EvaluationBatch':
+        """Build a batch from individual file results."""
+        batch = cls(len(file_evaluations))
+        for evaluation in file_evaluations:
+            batch.add(evaluation)
+        return batch
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, filename: str, score: int, reason: str, file_type: str):
+        """Store the fields of a file result in the next free slot, growing the columns when all slots are used."""
+        i = self._count
+        if i == len(self.scores):
+            # Not pre-sized, e.g. when the files are streamed in as they download
+            self.scores.append(score)
+            self.filenames.append(filename)
+            self.reasons.append(reason)
+            self.file_types.append(file_type)
+        else:
+            self.scores[i] = score
+            self.filenames[i] = filename
+            self.reasons[i] = reason
+            self.file_types[i] = file_type
+        self._count += 1
+
+    def add(self, evaluation: FileEvaluation):
+        """Store a file result in the next free slot."""
+        self.append(evaluation.filename, evaluation.score, evaluation.reason, evaluation.file_type)
+
+    def get(self, i: int) -> FileEvaluation:
+        """Materialize the result in slot `i`."""
+        return FileEvaluation(
+            filename=self.filenames[i],
+            score=self.scores[i],
+            reason=self.reasons[i],
+            file_type=self.file_types[i]
+        )
+
+
+@dataclass(init=False)
 class OverallEvaluation:
     """Data class to store overall evaluation results."""
     score: int
     reason: str
     total_files: int
-    file_evaluations: List[FileEvaluation]
+    results: EvaluationBatch
+
+    def __init__(self, score: int, reason: str, total_files: int, file_evaluations: Optional[List[FileEvaluation]] = None, results: Optional[EvaluationBatch] = None):
+        """Store the overall result with the file results, given either as FileEvaluation objects or as a batch."""
+        self.score = score
+        self.reason = reason
+        self.total_files = total_files
+        self.results = results if results is not None else EvaluationBatch.from_evaluations(file_evaluations or [])
+
+    @property
+    def file_evaluations(self) -> List[FileEvaluation]:
+        """Individual file results, materialized from the batch on access."""
+        return [self.results.get(i) for i in range(len(self.results))]
 
 def print_results(evaluation: OverallEvaluation):
     """Print the evaluation results in a formatted way."""
@@ -36,207 +108,471 @@ def print_results(evaluation: OverallEvaluation):
     click.echo(f"REASON: {evaluation.reason}")
     click.echo(f"TOTAL FILES ANALYZED: {evaluation.total_files}")
     
-    if evaluation.file_evaluations:
+    results = evaluation.results
+    if len(results):
         click.echo("\nINDIVIDUAL FILE SCORES:")
         click.echo("-" * 80)
         
-        # Sort by score (highest first)
-        sorted_evals = sorted(evaluation.file_evaluations, key=lambda x: x.score, reverse=True)
+        # Sort by score (highest first). Scores are integers from 1 to 10, so a
+        # counting sort does it in one pass; equal scores keep their order like sorted()
+        buckets = [[] for _ in range(11)]
+        for i in range(len(results)):
+            buckets[results.scores[i]].append(i)
         
-        for eval in sorted_evals:
+        # Results are only turned into objects one at a time, as they are printed
+        for i in (i for bucket in reversed(buckets) for i in bucket):
+            eval = results.get(i)
             click.echo(f"\nFile: {eval.filename}")
             click.echo(f"Score: {eval.score}/10")
             click.echo(f"Type: {eval.file_type}")
             click.echo(f"Reason: {eval.reason}")
             click.echo("-" * 40)
 
+# Structured output schemas; the service rejects any answer that does not match them
+_FILE_EVAL_PROPERTIES = {
+    "score": {"type": "integer", "description": "AI generation likelihood from 1 to 10"},
+    "reason": {"type": "string"},
+}
+
+EVAL_SCHEMA = {
+    "name": "FileEval",
+    "schema": {
+        "type": "object",
+        "properties": _FILE_EVAL_PROPERTIES,
+        "required": ["score", "reason"],
+        "additionalProperties": False,
+    },
+    "strict": True,
+}
+
+BATCH_EVAL_SCHEMA = {
+    "name": "FileEvalBatch",
+    "schema": {
+        "type": "object",
+        "properties": {
+            "files": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "index": {"type": "integer", "description": "Number of the file block being evaluated"},
+                        **_FILE_EVAL_PROPERTIES,
+                    },
+                    "required": ["index", "score", "reason"],
+                    "additionalProperties": False,
+                },
+            },
+        },
+        "required": ["files"],
+        "additionalProperties": False,
+    },
+    "strict": True,
+}
+
+# Common code file extensions, kept at module level for the file scan hot loop
+_CODE_EXT: frozenset = frozenset({
+    '.py', '.js', '.ts', '.jsx', '.tsx', '.java', '.cpp', '.c', '.cs',
+    '.go', '.rs', '.php', '.rb', '.swift', '.kt', '.scala', '.sh',
+    '.ps1', '.sql', '.html', '.css', '.vue', '.dart', '.r', '.m'
+})
+
+# Folders never evaluated, in addition to hidden folders and the user's exclusions
+_DEFAULT_EXCLUDED_FOLDERS: frozenset = frozenset({'.git', 'node_modules', '__pycache__', 'venv', 'env', '.venv'})
+
+def _retry_after(error: RateLimitError) -> Optional[float]:
+    """Return the delay in seconds requested by a 429 response, if any."""
+    headers = error.response.headers
+    try:
+        if 'retry-after-ms' in headers:
+            return float(headers['retry-after-ms']) / 1000
+        if 'retry-after' in headers:
+            return float(headers['retry-after'])
+    except ValueError:
+        pass
+    return None
+
 class AICodeEvaluator:
     """Main class for evaluating code files using Azure OpenAI."""
 
     # Common code file extensions
-    CODE_EXTENSIONS = {
-        '.py', '.js', '.ts', '.jsx', '.tsx', '.java', '.cpp', '.c', '.cs',
-        '.go', '.rs', '.php', '.rb', '.swift', '.kt', '.scala', '.sh',
-        '.ps1', '.sql', '.html', '.css', '.vue', '.dart', '.r', '.m'
-    }
-
-    def __init__(self, azure_endpoint: str, api_key: str, api_version: str = "2024-02-15-preview"):
-        """Initialize the evaluator with Azure OpenAI credentials."""
+    CODE_EXTENSIONS = _CODE_EXT
+
+    # Identifies the prompt revision; part of the result cache key.
+    # Bump it whenever SYSTEM_PROMPT changes.
+    PROMPT_VERSION = "ai-detect-v4"
+
+    # Cap on the answer length per file; also budgeted against the TPM quota
+    MAX_COMPLETION_TOKENS = 200
+
+    # Attempts made after a 429, 5xx or connection error before giving up on a request
+    MAX_RETRIES = 5
+
+    # Files smaller than this (in bytes) are evaluated together, BATCH_SIZE per request
+    SMALL_FILE_BYTES = 2048
+    BATCH_SIZE = 8
+
+    # Files up to this many characters are evaluated whole; longer files are
+    # split into content-defined chunks evaluated together in one request
+    MAX_CONTENT_CHARS = 8000
+
+    # Characters of each file read at most; the rest is truncated
+    MAX_FILE_CHARS = 64000
+
+    # Stable instructions shared by every request, sent ahead of the per-file content.
+    # Provider prefix caching only starts at 1024 identical leading tokens, which this
+    # prompt (~400 tokens) does not reach, so no cache warm-up request is sent.
+    SYSTEM_PROMPT = """You are an expert code analyst specializing in identifying AI-generated code. Always respond with valid JSON only.
+
+Analyze the code provided by the user and determine how likely it is that this code was generated by an AI code generation tool (like GitHub Copilot, ChatGPT, Claude, etc.).
+
+Consider these factors:
+1. Code style and patterns (AI often generates very consistent, sometimes overly structured code)
+2. Comments (AI tends to generate comprehensive comments, sometimes overly detailed)
+3. Variable and function naming (AI often uses very descriptive, sometimes verbose names)
+4. Code structure (AI tends to follow best practices rigidly)
+5. Error handling (AI often includes comprehensive error handling)
+6. Documentation strings and type hints (AI frequently includes these)
+7. Coding patterns that are typical of AI generation
+8. Lack of personal coding quirks or shortcuts that human developers often use
+
+Provide a score from 1 to 10 where:
+- 1-2: Very unlikely to be AI-generated (clearly human-written)
+- 3-4: Probably human-written with some AI assistance possible
+- 5-6: Could be either human or AI-written
+- 7-8: Likely AI-generated with possible human modifications
+- 9-10: Very likely AI-generated
+
+Respond with only a JSON object in this format:
+{"score": <number>, "reason": "<brief reason, at most two sentences>"}
+
+When the user provides several files, each introduced by a line "=== FILE <number>: <path> ===", evaluate each file independently and respond with only a JSON object in this format, with one entry per file:
+{"files": [{"index": <number of the file>, "score": <number>, "reason": "<brief reason, at most two sentences>"}]}"""
+
+    # Per-file user messages; only these placeholders change between requests
+    _PROMPT_TMPL = "File: {name}\nFile type: {suffix}\n\nCode:\n```\n{content}\n```"
+    _BATCH_FILE_TMPL = "=== FILE {index}: {name} ===\n{content}\n"
+
+    def __init__(self, azure_endpoint: str, api_key: str, api_version: str = "2024-10-21", cache: Optional[EvaluationCache] = None, rate_limiter: Optional[RateLimiter] = None, prefilter: bool = False):
+        """Initialize the evaluator with Azure OpenAI credentials and optional caching, rate limiting and heuristic pre-filtering."""
+        # One pooled HTTP/2 client shared by all requests, so connections and
+        # TLS sessions are reused across the concurrent fan-out
+        self.http_client = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=64),
+            timeout=60
+        )
         self.client: AsyncAzureOpenAI = AsyncAzureOpenAI(
             azure_endpoint=azure_endpoint,
             api_key=api_key,
-            api_version=api_version
+            api_version=api_version,
+            http_client=self.http_client,
+            # Retries are handled in _complete, where they go through the rate limiter
+            max_retries=0
         )
-
-    def is_code_file(self, file_path: Path, exclude_extensions: Set[str] = None) -> bool:
-        """Check if a file is a code file based on its extension."""
-        if exclude_extensions and file_path.suffix.lower() in exclude_extensions:
-            return False
-        return file_path.suffix.lower() in self.CODE_EXTENSIONS
-
-    def should_exclude_folder(self, folder_path: Path, exclude_folders: Set[str] = None) -> bool:
-        """Check if a folder should be excluded."""
-        if exclude_folders:
-            # Check if any part of the path matches excluded folders
-            for part in folder_path.parts:
-                if part in exclude_folders:
-                    return True
-        return False
-
-    def get_code_files(self, folder_path: Path, exclude_extensions: Set[str] = None, exclude_folders: Set[str] = None) -> List[Path]:
-        """Recursively find all code files in the given folder."""
+        # Built once so every request starts with an identical prefix
+        self.system_message = {"role": "system", "content": self.SYSTEM_PROMPT}
+        # The fixed prefix is estimated once; only the per-file part is estimated per request
+        self._system_prompt_tokens = estimate_tokens(self.SYSTEM_PROMPT)
+        self.cache = cache
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.prefilter = prefilter
+
+    async def close(self):
+        """Close the Azure OpenAI client, its pooled HTTP connections and the result cache."""
+        await self.client.close()
+        await self.http_client.aclose()
+        if self.cache:
+            self.cache.close()
+
+    def get_code_files(self, folder_path: Path, exclude_extensions: Set[str] = None, exclude_folders: Set[str] = None) -> List[Tuple[Path, int]]:
+        """Recursively find all code files in the given folder and return them with their sizes in bytes."""
         code_files = []
 
-        # Default exclusions
-        default_exclusions = {'.git', 'node_modules', '__pycache__', 'venv', 'env', '.venv'}
-
         # Combine default exclusions with user-specified exclusions
-        all_excluded_folders = default_exclusions
+        all_excluded_folders = _DEFAULT_EXCLUDED_FOLDERS
         if exclude_folders:
             all_excluded_folders = all_excluded_folders.union(exclude_folders)
 
-        # Use rglob for recursive globbing which is more efficient
-        for file_path in folder_path.rglob('*'):
-            # Skip files in excluded directories
-            if any(part.startswith('.') or part in all_excluded_folders
-                   for part in file_path.parts):
-                continue
+        excluded_suffixes = exclude_extensions or ()
 
-            # Skip if the parent folder should be excluded
-            if self.should_exclude_folder(file_path.parent, exclude_folders):
+        # Walk with os.scandir so excluded and hidden folders are pruned before
+        # descending into them, and directory entries provide file types for free
+        pending = [str(folder_path)]
+        while pending:
+            try:
+                entries = os.scandir(pending.pop())
+            except OSError:
                 continue
-
-            if (file_path.is_file() and
-                self.is_code_file(file_path, exclude_extensions) and
-                file_path.stat().st_size > 0):
-                code_files.append(file_path)
+            with entries:
+                for entry in entries:
+                    if entry.name.startswith('.'):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in all_excluded_folders:
+                            pending.append(entry.path)
+                    elif entry.is_file():
+                        # Same result as Path.suffix.lower(), without building a Path
+                        # for every file that is going to be rejected
+                        stem, _, ext = entry.name.rpartition('.')
+                        suffix = '.' + ext.lower() if stem else ''
+                        if suffix in _CODE_EXT and suffix not in excluded_suffixes:
+                            size = entry.stat().st_size
+                            if size > 0:
+                                code_files.append((Path(entry.path), size))
 
         return code_files
 
-    async def read_file_content(self, file_path: Path) -> str:
-        """Asynchronously read and return the content of a file."""
+    def should_evaluate(self, name: str, size: int, exclude_extensions: Set[str] = None, exclude_folders: Set[str] = None) -> bool:
+        """Check whether a file, given by its '/'-separated path relative to the evaluated folder, passes the same filters as get_code_files."""
+        parts = name.split('/')
+        if any(part.startswith('.') for part in parts):
+            return False
+        excluded_folders = _DEFAULT_EXCLUDED_FOLDERS.union(exclude_folders) if exclude_folders else _DEFAULT_EXCLUDED_FOLDERS
+        if any(part in excluded_folders for part in parts[:-1]):
+            return False
+        stem, _, ext = parts[-1].rpartition('.')
+        suffix = '.' + ext.lower() if stem else ''
+        return (suffix in _CODE_EXT and not (exclude_extensions and suffix in exclude_extensions)
+                and size > 0)
+
+    def _read_file(self, file_path: Path) -> str:
+        """Read and return the content of a file, truncated to MAX_FILE_CHARS."""
         try:
-            async with aiofiles.open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = await f.read()
-                # Limit content size to avoid token limits
-                if len(content) > 8000:
-                    content = content[:8000] + "\n... (truncated)"
-                return content
+            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+                # Read one character past the limit to detect truncation
+                # without loading the rest of a large file
+                content = f.read(self.MAX_FILE_CHARS + 1)
+            # Limit content size to avoid token limits
+            if len(content) > self.MAX_FILE_CHARS:
+                content = content[:self.MAX_FILE_CHARS] + "\n... (truncated)"
+            return content
         except Exception as e:
             return f"Error reading file: {str(e)}"
 
-    async def evaluate_file(self, file_path: Path, deployment_name: str, base_path: Path) -> FileEvaluation:
-        """Asynchronously evaluate a single file using Azure OpenAI."""
+    async def read_file_content(self, file_path: Path) -> str:
+        """Asynchronously read and return the content of a file."""
+        # A single worker-thread hop per file, rather than one each for open, read and close
+        return await asyncio.to_thread(self._read_file, file_path)
+
+    async def read_files_content(self, file_paths: List[Path]) -> List[str]:
+        """Asynchronously read several files in a single worker-thread hop."""
+        return await asyncio.to_thread(lambda: [self._read_file(file_path) for file_path in file_paths])
+
+    async def _complete(self, deployment_name: str, user_content: str, **options) -> str:
+        """Stream a chat completion with the shared system prompt and return its text, respecting the rate limits and retrying transient errors."""
+        estimated_tokens = (self._system_prompt_tokens + estimate_tokens(user_content)
+                            + options.get('max_tokens', self.MAX_COMPLETION_TOKENS))
+        for attempt in range(self.MAX_RETRIES + 1):
+            await self.rate_limiter.acquire(estimated_tokens)
+            try:
+                stream = await self.client.chat.completions.create(
+                    model=deployment_name,
+                    messages=[
+                        self.system_message,
+                        {"role": "user", "content": user_content}
+                    ],
+                    stream=True,
+                    **options
+                )
+                break
+            except RateLimitError as e:
+                if attempt == self.MAX_RETRIES:
+                    raise
+                # Honor Retry-After when present, otherwise back off exponentially;
+                # the pause applies to every worker, not just this request
+                self.rate_limiter.pause(_retry_after(e) or 2 ** attempt)
+            except (APIConnectionError, InternalServerError):
+                if attempt == self.MAX_RETRIES:
+                    raise
+                await asyncio.sleep(2 ** attempt)
+
+        # Collect the answer as it is generated so the event loop keeps serving
+        # the other workers instead of waiting on one large response body
+        parts = []
+        finish_reason = None
+        async for chunk in stream:
+            # Azure sends chunks without choices (e.g. content filter results)
+            if not chunk.choices:
+                continue
+            if chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+            finish_reason = chunk.choices[0].finish_reason or finish_reason
+
+        # A cut-off answer is invalid JSON; report why instead of a parse error
+        if finish_reason == "length":
+            raise ValueError(f"Response truncated at {options.get('max_tokens')} tokens")
+        return "".join(parts)
+
+    def _cache_key(self, content: str, deployment_name: str) -> Optional[str]:
+        """Return the result cache key for some content, or None when caching is disabled."""
+        if not self.cache:
+            return None
+        return EvaluationCache.make_key(content, deployment_name, self.PROMPT_VERSION)
+
+    async def _score_file(self, file_path: Path, filename: str, deployment_name: str) -> Tuple[int, str]:
+        """Evaluate a single file using Azure OpenAI and return its (score, reason)."""
         content = await self.read_file_content(file_path)
 
-        prompt = f"""
-        Analyze the following code and determine how likely it is that this code was generated by an AI code generation tool (like GitHub Copilot, ChatGPT, Claude, etc.).
-
-        Consider these factors:
-        1. Code style and patterns (AI often generates very consistent, sometimes overly structured code)
-        2. Comments (AI tends to generate comprehensive comments, sometimes overly detailed)
-        3. Variable and function naming (AI often uses very descriptive, sometimes verbose names)
-        4. Code structure (AI tends to follow best practices rigidly)
-        5. Error handling (AI often includes comprehensive error handling)
-        6. Documentation strings and type hints (AI frequently includes these)
-        7. Coding patterns that are typical of AI generation
-        8. Lack of personal coding quirks or shortcuts that human developers often use
-
-        File: {file_path.name}
-        File type: {file_path.suffix}
-
-        Code:
-        ```
-        {content}
-        ```
-
-        Provide a score from 1 to 10 where:
-        - 1-2: Very unlikely to be AI-generated (clearly human-written)
-        - 3-4: Probably human-written with some AI assistance possible
-        - 5-6: Could be either human or AI-written
-        - 7-8: Likely AI-generated with possible human modifications
-        - 9-10: Very likely AI-generated
-
-        Respond with only a JSON object in this format:
-        {{"score": <number>, "reason": "<detailed explanation of your reasoning>"}}
-        """
+        if len(content) > self.MAX_CONTENT_CHARS:
+            return await self._score_chunked(file_path, filename, content, deployment_name)
 
-        try:
-            response = await self.client.chat.completions.create(
-                model=deployment_name,
-                messages=[
-                    {"role": "system", "content": "You are an expert code analyst specializing in identifying AI-generated code. Always respond with valid JSON only."},
-                    {"role": "user", "content": prompt}
-                ],
-                response_format={"type": "json_object"},
-                temperature=0.1
-            )
+        # Reuse a previous result for identical content without calling the model
+        cache_key = self._cache_key(content, deployment_name)
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached:
+                return cached
 
-            result_text = response.choices[0].message.content.strip()
+        # Skip the model when cheap style heuristics are already conclusive
+        heuristic = heuristic_evaluation(content, file_path.suffix) if self.prefilter else None
+        if heuristic:
+            return heuristic
 
-            # Try to parse JSON response
-            try:
-                result = json.loads(result_text)
-                score = max(1, min(10, int(result.get('score', 5))))
-                reason = result.get('reason', 'No reason provided')
-            except json.JSONDecodeError:
-                # Fallback if JSON parsing fails
-                score = 5
-                reason = f"Unable to parse AI response: {result_text[:200]}"
-
-            return FileEvaluation(
-                filename=str(file_path.relative_to(base_path)),
-                score=score,
-                reason=reason,
-                file_type=file_path.suffix
-            )
+        # Only the per-file part goes in the user message, at the tail of the prompt
+        prompt = self._PROMPT_TMPL.format_map({'name': file_path.name, 'suffix': file_path.suffix, 'content': content})
+
+        try:
+            # The service enforces the schema, so the answer always has this shape
+            result = json.loads(await self._complete(
+                deployment_name,
+                prompt,
+                response_format={"type": "json_schema", "json_schema": EVAL_SCHEMA},
+                temperature=0.1,
+                max_tokens=self.MAX_COMPLETION_TOKENS
+            ))
+            score = max(1, min(10, result['score']))
+            reason = result['reason']
+
+            if cache_key:
+                self.cache.set(cache_key, score, reason)
+
+            return score, reason
 
         except Exception as e:
-            return FileEvaluation(
-                filename=str(file_path.relative_to(base_path)),
-                score=5,
-                reason=f"Error during evaluation: {str(e)}",
-                file_type=file_path.suffix
-            )
+            return 5, f"Error during evaluation: {str(e)}"
+
+    async def _evaluate_snippets(self, snippets: List[Tuple[str, str, str]], deployment_name: str) -> List[Tuple[int, str]]:
+        """Evaluate (label, suffix, content) snippets with a single Azure OpenAI request and return a (score, reason) per snippet."""
+        results: List[Optional[Tuple[int, str]]] = [None] * len(snippets)
+        pending = []
+        for i, (label, suffix, content) in enumerate(snippets):
+            cache_key = self._cache_key(content, deployment_name)
+            cached = self.cache.get(cache_key) if cache_key else None
+            if not cached and self.prefilter:
+                cached = heuristic_evaluation(content, suffix)
+            if cached:
+                results[i] = cached
+            else:
+                pending.append((i, label, content, cache_key))
+
+        if not pending:
+            return results
+
+        # Blocks are numbered and answers matched back by number, since the model
+        # cannot be relied on to echo paths exactly
+        prompt = "".join(
+            self._BATCH_FILE_TMPL.format_map({'index': number, 'name': label, 'content': content})
+            for number, (_, label, content, _) in enumerate(pending, start=1)
+        )
+
+        try:
+            result = json.loads(await self._complete(
+                deployment_name,
+                prompt,
+                response_format={"type": "json_schema", "json_schema": BATCH_EVAL_SCHEMA},
+                temperature=0.1,
+                max_tokens=self.MAX_COMPLETION_TOKENS * len(pending)
+            ))
+            # If the model answers a number twice, its first answer is kept
+            results_by_index = {}
+            for item in result['files']:
+                results_by_index.setdefault(item['index'], item)
+        except Exception as e:
+            for i, _, _, _ in pending:
+                results[i] = (5, f"Error during evaluation: {str(e)}")
+            return results
+
+        for number, (i, _, _, cache_key) in enumerate(pending, start=1):
+            item = results_by_index.get(number)
+            if item is None:
+                results[i] = (5, "No evaluation returned for this file")
+            else:
+                score = max(1, min(10, item['score']))
+                results[i] = (score, item['reason'])
+                if cache_key:
+                    self.cache.set(cache_key, score, item['reason'])
+
+        return results
+
+    async def _score_files(self, file_paths: List[Path], filenames: List[str], deployment_name: str) -> List[Tuple[int, str]]:
+        """Evaluate several small files with a single Azure OpenAI request and return a (score, reason) per file."""
+        contents = await self.read_files_content(file_paths)
+        return await self._evaluate_snippets(
+            [(filename, file_path.suffix, content) for filename, file_path, content in zip(filenames, file_paths, contents)],
+            deployment_name
+        )
+
+    async def _score_chunked(self, file_path: Path, filename: str, content: str, deployment_name: str) -> Tuple[int, str]:
+        """Evaluate a large file as content-defined chunks in one request and weight the chunk scores by length."""
+        chunks = chunk_content(content)
+        labels = [f"{filename} (part {i}/{len(chunks)})" for i in range(1, len(chunks) + 1)]
+        results = await self._evaluate_snippets([(label, file_path.suffix, chunk) for label, chunk in zip(labels, chunks)], deployment_name)
+
+        weighted_score = sum(score * len(chunk) for (score, _), chunk in zip(results, chunks)) / len(content)
+        score = max(1, min(10, round(weighted_score)))
+
+        # Explain with the part whose own score is closest to the overall one
+        closest = min(range(len(chunks)), key=lambda i: abs(results[i][0] - weighted_score))
+        part_scores = ", ".join(str(part_score) for part_score, _ in results)
+        reason = (f"Length-weighted score of {len(chunks)} parts (scores: {part_scores}). "
+                  f"Part {closest + 1}: {results[closest][1]}")
 
-    def calculate_overall_score(self, file_evaluations: List[FileEvaluation]) -> OverallEvaluation:
+        return score, reason
+
+    def calculate_overall_score(self, results: Union[EvaluationBatch, List[FileEvaluation]]) -> OverallEvaluation:
         """Calculate overall evaluation based on individual file scores."""
-        if not file_evaluations:
+        if not isinstance(results, EvaluationBatch):
+            results = EvaluationBatch.from_evaluations(results)
+
+        total_files = len(results)
+        if not total_files:
             return OverallEvaluation(
                 score=1,
                 reason="No code files found to evaluate",
-                total_files=0,
-                file_evaluations=[]
+                total_files=0
             )
 
+        # sum() and Counter() each walk the contiguous score array once in C
+        scores = results.scores[:total_files]
+        total_score = sum(scores)
+        counts = Counter(scores)
+        high_scores = sum(counts[score] for score in range(7, 11))
+        medium_scores = sum(counts[score] for score in range(4, 7))
+        low_scores = total_files - high_scores - medium_scores
+
         # Calculate weighted average (give more weight to files with higher scores)
-        total_score = sum(eval.score for eval in file_evaluations)
-        average_score = total_score / len(file_evaluations)
+        average_score = total_score / total_files
 
         # Round to nearest integer
         overall_score = max(1, min(10, round(average_score)))
 
         # Generate reason based on score distribution
-        high_scores = sum(1 for eval in file_evaluations if eval.score >= 7)
-        medium_scores = sum(1 for eval in file_evaluations if 4 <= eval.score <= 6)
-        low_scores = sum(1 for eval in file_evaluations if eval.score <= 3)
-
-        if high_scores > len(file_evaluations) * 0.6:
-            reason = f"Most files ({high_scores}/{len(file_evaluations)}) show strong indicators of AI generation"
-        elif low_scores > len(file_evaluations) * 0.6:
-            reason = f"Most files ({low_scores}/{len(file_evaluations)}) appear to be human-written"
+        if high_scores > total_files * 0.6:
+            reason = f"Most files ({high_scores}/{total_files}) show strong indicators of AI generation"
+        elif low_scores > total_files * 0.6:
+            reason = f"Most files ({low_scores}/{total_files}) appear to be human-written"
         else:
             reason = f"Mixed results: {high_scores} likely AI-generated, {medium_scores} uncertain, {low_scores} likely human-written"
 
         return OverallEvaluation(
             score=overall_score,
             reason=reason,
-            total_files=len(file_evaluations),
-            file_evaluations=file_evaluations
+            total_files=total_files,
+            results=results
         )
 
-    async def evaluate_folder(self, folder_path: Path, deployment_name: str, exclude_extensions: Set[str] = None, exclude_folders: Set[str] = None) -> OverallEvaluation:
-        """Asynchronously evaluate all code files in a folder and its subfolders."""
+    async def evaluate_folder(self, folder_path: Path, deployment_name: str, exclude_extensions: Set[str] = None, exclude_folders: Set[str] = None, concurrency: int = 5) -> OverallEvaluation:
+        """Asynchronously evaluate all code files in a folder and its subfolders, with at most `concurrency` requests in flight."""
         click.echo(f"Scanning for code files in: {folder_path}")
 
         if exclude_extensions:
@@ -251,31 +587,80 @@ class AICodeEvaluator:
             return OverallEvaluation(
                 score=1,
                 reason="No code files found to evaluate",
-                total_files=0,
-                file_evaluations=[]
+                total_files=0
             )
 
         click.echo(f"Found {len(code_files)} code files to evaluate (including subfolders)...")
 
-        # Create tasks for concurrent evaluation
-        tasks = []
-        for file_path in code_files:
-            task = self.evaluate_file(file_path, deployment_name, folder_path)
-            tasks.append(task)
+        # Sizes come from the scan, so no file is stat'ed twice
+        files: asyncio.Queue = asyncio.Queue()
+        for file_path, size in code_files:
+            files.put_nowait((file_path, str(file_path.relative_to(folder_path)), size))
+        files.put_nowait(None)
 
-        # Use a semaphore to limit concurrent requests to avoid rate limits
-        semaphore = asyncio.Semaphore(5)  # Limit to 5 concurrent requests
+        return await self.evaluate_files(files, deployment_name, concurrency, total=len(code_files))
 
-        async def evaluate_with_semaphore(task):
-            async with semaphore:
-                return await task
-
-        # Execute all tasks concurrently with progress tracking
-        file_evaluations = []
-        with click.progressbar(length=len(tasks), label='Evaluating files') as bar:
-            for task in asyncio.as_completed([evaluate_with_semaphore(task) for task in tasks]):
-                evaluation = await task
-                file_evaluations.append(evaluation)
-                bar.update(1)
+    async def evaluate_files(self, files: asyncio.Queue, deployment_name: str, concurrency: int = 5, total: Optional[int] = None) -> OverallEvaluation:
+        """
+        Evaluate files as they arrive on a queue, with at most `concurrency` requests in flight.
 
-        return self.calculate_overall_score(file_evaluations)
\ No newline at end of file
+        Items are (path, name, size) tuples, where name is the path shown in the results,
+        and a None item ends the stream. Files are dispatched as soon as they arrive, so a
+        PR can be evaluated while it is still downloading.
+        """
+        # Results are stored column-wise, in slots pre-sized when the number of files is known
+        results = EvaluationBatch(total or 0)
+        work: asyncio.Queue = asyncio.Queue()
+
+        async def dispatch():
+            # Small files are grouped so the shared prompt is paid once per batch
+            # instead of once per file; larger files are evaluated on their own
+            small_files = []
+            while (item := await files.get()) is not None:
+                if item[2] < self.SMALL_FILE_BYTES:
+                    small_files.append(item)
+                    if len(small_files) == self.BATCH_SIZE:
+                        work.put_nowait(small_files)
+                        small_files = []
+                else:
+                    work.put_nowait([item])
+            if small_files:
+                work.put_nowait(small_files)
+            # One end marker per worker
+            for _ in range(concurrency):
+                work.put_nowait(None)
+
+        # A fixed pool of workers keeps only `concurrency` requests (and coroutines) alive at any time
+        async def worker(progress):
+            while (items := await work.get()) is not None:
+                file_paths = [file_path for file_path, _, _ in items]
+                filenames = [filename for _, filename, _ in items]
+                # Results go straight into the batch slots, without a FileEvaluation per file
+                if len(items) == 1:
+                    scored = [await self._score_file(file_paths[0], filenames[0], deployment_name)]
+                else:
+                    scored = await self._score_files(file_paths, filenames, deployment_name)
+                for file_path, filename, (score, reason) in zip(file_paths, filenames, scored):
+                    results.append(filename, score, reason, file_path.suffix)
+                progress(len(items))
+
+        # The total is unknown while files are still arriving, so show a running count instead of a bar
+        with (click.progressbar(length=total, label='Evaluating files') if total else contextlib.nullcontext()) as bar:
+            evaluated = 0
+
+            def progress(count: int):
+                nonlocal evaluated
+                evaluated += count
+                if bar:
+                    bar.update(count)
+                else:
+                    click.echo(f"\rEvaluated {evaluated} files", nl=False)
+
+            async with asyncio.TaskGroup() as tasks:
+                tasks.create_task(dispatch())
+                for _ in range(concurrency):
+                    tasks.create_task(worker(progress))
+
+        if not bar and evaluated:
+            click.echo()
+        return self.calculate_overall_score(results)
@@ -0,0 +1,42 @@
+import hashlib
+from pathlib import Path
+from typing import Optional, Tuple
+import diskcache
+
+DEFAULT_CACHE_DIR = Path.home() / '.cache' / 'ai-code-eval'
+
+# Disk space the cache may use before the least recently used entries are evicted
+DEFAULT_SIZE_LIMIT = 256 * 1024 * 1024
+
+
+class EvaluationCache:
+    """Persistent cache of file evaluation results keyed by file content."""
+
+    def __init__(self, cache_dir: Path = DEFAULT_CACHE_DIR, size_limit: int = DEFAULT_SIZE_LIMIT):
+        """Open the cache in the cache directory, evicting least recently used entries beyond `size_limit` bytes."""
+        # Every set() is committed immediately, so an interrupted run keeps the results it paid for
+        self._cache = diskcache.Cache(str(cache_dir), size_limit=size_limit, eviction_policy='least-recently-used')
+
+    @staticmethod
+    def make_key(content: str, deployment_name: str, prompt_version: str) -> str:
+        """Build a cache key from the normalized content, deployment and prompt revision."""
+        # Ignore line endings and trailing whitespace so the same file checked out
+        # on different platforms shares one entry
+        normalized = "\n".join(line.rstrip() for line in content.splitlines())
+        digest = hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+        return f"{digest}:{deployment_name}:{prompt_version}"
+
+    def get(self, key: str) -> Optional[Tuple[int, str]]:
+        """Return the cached (score, reason) for a key, if any."""
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        return entry['score'], entry['reason']
+
+    def set(self, key: str, score: int, reason: str):
+        """Store an evaluation result."""
+        self._cache.set(key, {'score': score, 'reason': reason})
+
+    def close(self):
+        """Release the cache's database connection."""
+        self._cache.close()
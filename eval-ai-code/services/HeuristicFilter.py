@@ -0,0 +1,149 @@
+import math
+from typing import Optional, Tuple
+
+_HASH_COMMENTS = ('#',)
+_C_STYLE_COMMENTS = ('//',)
+_C_STYLE_BLOCK = ('/*', '*/')
+
+# Line comment prefixes per file suffix. Only these languages are pre-filtered: '#' is
+# not a comment in C-family code (#include, #define, #pragma), and languages such as
+# SQL, HTML and CSS are always left to the model.
+COMMENT_PREFIXES = {
+    '.py': _HASH_COMMENTS,
+    '.rb': _HASH_COMMENTS,
+    '.sh': _HASH_COMMENTS,
+    '.r': _HASH_COMMENTS,
+    '.ps1': _HASH_COMMENTS,
+    '.php': _C_STYLE_COMMENTS + _HASH_COMMENTS,
+    '.js': _C_STYLE_COMMENTS,
+    '.ts': _C_STYLE_COMMENTS,
+    '.jsx': _C_STYLE_COMMENTS,
+    '.tsx': _C_STYLE_COMMENTS,
+    '.java': _C_STYLE_COMMENTS,
+    '.c': _C_STYLE_COMMENTS,
+    '.cpp': _C_STYLE_COMMENTS,
+    '.cs': _C_STYLE_COMMENTS,
+    '.go': _C_STYLE_COMMENTS,
+    '.rs': _C_STYLE_COMMENTS,
+    '.swift': _C_STYLE_COMMENTS,
+    '.kt': _C_STYLE_COMMENTS,
+    '.scala': _C_STYLE_COMMENTS,
+    '.dart': _C_STYLE_COMMENTS,
+}
+
+# Block comment (opening, closing) delimiters per file suffix. Every line of an open
+# block is a comment, so ' * ...' continuations count while '*p = x;' does not.
+BLOCK_COMMENTS = {
+    '.ps1': ('<#', '#>'),
+    **{suffix: _C_STYLE_BLOCK for suffix, prefixes in COMMENT_PREFIXES.items() if '//' in prefixes},
+}
+
+# Markers counted as one documentation block each; Python docstrings open and close with the same marker
+DOC_MARKERS = {
+    '.py': ('"""', "'''"),
+}
+_C_STYLE_DOC_MARKERS = ('/**',)
+
+# Hand-tuned weights of the logistic model; positive weights push towards AI-generated.
+# They are not calibrated against labelled data, so the "probability" is only a score.
+WEIGHTS = {
+    'comment_ratio': 6.0,
+    'docstring_density': 1.5,
+    'mixed_indentation': -3.0,
+    'trailing_whitespace_ratio': -4.0,
+}
+BIAS = -2.0
+
+# Files scoring at least this are reported as AI-generated without calling the model.
+# Nothing is ever reported as human-written: with no comments the score already sits
+# at the bias, so the absence of a signal would be read as a verdict.
+AI_THRESHOLD = 0.9
+
+# Smaller files carry too little signal for the heuristic
+MIN_LINES = 20
+
+
+def _count_doc_blocks(content: str, suffix: str) -> float:
+    """Count documentation blocks using the markers of the file's language."""
+    if suffix in DOC_MARKERS:
+        return sum(content.count(marker) for marker in DOC_MARKERS[suffix]) / 2
+    if BLOCK_COMMENTS.get(suffix) == _C_STYLE_BLOCK:
+        return sum(content.count(marker) for marker in _C_STYLE_DOC_MARKERS)
+    return 0
+
+
+def extract_features(content: str, suffix: str) -> Optional[dict]:
+    """Compute cheap style features of a file in one pass, or None if it is too small or its language is not supported."""
+    suffix = suffix.lower()
+    comment_prefixes = COMMENT_PREFIXES.get(suffix)
+    if comment_prefixes is None:
+        return None
+    block_open, block_close = BLOCK_COMMENTS.get(suffix, (None, None))
+
+    code_lines = 0
+    comment_lines = 0
+    trailing_whitespace = 0
+    tab_indented = False
+    space_indented = False
+    in_block = False
+
+    for line in content.splitlines():
+        stripped = line.strip()
+        if not stripped:
+            continue
+        code_lines += 1
+        if line[-1] in ' \t':
+            trailing_whitespace += 1
+
+        if in_block:
+            is_comment = True
+            in_block = block_close not in stripped
+        elif block_open and stripped.startswith(block_open):
+            is_comment = True
+            in_block = block_close not in stripped[len(block_open):]
+        else:
+            is_comment = stripped.startswith(comment_prefixes)
+
+        if is_comment:
+            # Separator banners such as '# -----' are decoration, not commentary
+            if any(c.isalnum() for c in stripped):
+                comment_lines += 1
+            # Block comment continuations (' * ...') would otherwise read as mixed indentation
+            continue
+        if line[0] == '\t':
+            tab_indented = True
+        elif line[0] == ' ':
+            space_indented = True
+
+    if code_lines < MIN_LINES:
+        return None
+
+    docstrings = _count_doc_blocks(content, suffix)
+    return {
+        'comment_ratio': comment_lines / code_lines,
+        'docstring_density': min(1.0, docstrings * 50 / code_lines),
+        'mixed_indentation': 1.0 if tab_indented and space_indented else 0.0,
+        'trailing_whitespace_ratio': trailing_whitespace / code_lines,
+    }
+
+
+def heuristic_evaluation(content: str, suffix: str) -> Optional[Tuple[int, str]]:
+    """Return a (score, reason) when the style features of a file with the given suffix strongly suggest AI generation, otherwise None."""
+    features = extract_features(content, suffix)
+    if features is None:
+        return None
+
+    z = BIAS + sum(WEIGHTS[name] * value for name, value in features.items())
+    probability = 1 / (1 + math.exp(-z))
+
+    if probability < AI_THRESHOLD:
+        return None
+
+    reason = (
+        f"Heuristic pre-filter (style score {probability:.2f}): "
+        f"comment ratio {features['comment_ratio']:.2f}, "
+        f"docstring density {features['docstring_density']:.2f}, "
+        f"{'mixed' if features['mixed_indentation'] else 'consistent'} indentation, "
+        f"trailing whitespace on {features['trailing_whitespace_ratio']:.0%} of lines"
+    )
+    return 9, reason
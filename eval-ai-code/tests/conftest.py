@@ -0,0 +1,9 @@
+import pytest
+
+from services.CodeEvaluatorService import AICodeEvaluator
+
+
+@pytest.fixture
+def evaluator():
+    """An evaluator that is never connected to Azure OpenAI."""
+    return AICodeEvaluator("https://example.openai.azure.com", "test-key")
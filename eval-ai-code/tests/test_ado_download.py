@@ -0,0 +1,222 @@
+import asyncio
+import os
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from services import ADOService as ado_service
+from services.ADOService import COMPLETE_MARKER, _download_items, download_pr_changes_async
+
+SLOW_SECONDS = 5
+
+
+async def _items(request):
+    path = request.query['path']
+    if path == '/missing.py':
+        raise web.HTTPNotFound()
+    if path == '/slow.py':
+        await asyncio.sleep(SLOW_SECONDS)
+    return web.Response(body=f"# {path}\n".encode())
+
+
+async def _download(file_paths, folder, on_file=None):
+    app = web.Application()
+    app.router.add_get('/items', _items)
+    server = TestServer(app)
+    await server.start_server()
+    try:
+        await _download_items(str(server.make_url('/items')), 'pat', file_paths, 'main', str(folder), on_file)
+    finally:
+        await server.close()
+
+
+def test_files_are_written_with_their_folder_structure(tmp_path):
+    folder = tmp_path / 'pr'
+    folder.mkdir()
+
+    asyncio.run(_download(['/a.py', '/src/b.py'], folder))
+
+    assert (folder / 'a.py').read_text() == "# /a.py\n"
+    assert (folder / 'src' / 'b.py').read_text() == "# /src/b.py\n"
+
+
+def test_each_file_is_reported_once_written(tmp_path):
+    folder = tmp_path / 'pr'
+    folder.mkdir()
+    reported = []
+
+    def on_file(path, name, size):
+        reported.append((name, size, path.read_text()))
+
+    asyncio.run(_download(['/a.py', '/src/b.py'], folder, on_file))
+
+    assert sorted(reported) == [('a.py', 8, "# /a.py\n"), ('src/b.py', 12, "# /src/b.py\n")]
+
+
+def test_failed_download_cancels_the_others_and_removes_the_folder(tmp_path):
+    folder = tmp_path / 'pr'
+    folder.mkdir()
+
+    started = time.monotonic()
+    with pytest.raises(aiohttp.ClientResponseError) as error:
+        asyncio.run(_download(['/slow.py', '/missing.py', '/a.py'], folder))
+
+    assert error.value.status == 404
+    assert time.monotonic() - started < SLOW_SECONDS
+    assert not folder.exists()
+
+
+PR_URL = 'https://org.visualstudio.com/project/_git/repo/pullrequest/{pr_id}'
+
+
+class FakeGitClient:
+    """Answers the azure-devops calls made for a PR download from fixed iterations."""
+
+    def __init__(self, commits, paths=('/a.py', '/src/b.py')):
+        self.commits = commits
+        self.paths = paths
+        self.changes_requested = []
+
+    def get_pull_request_iterations(self, repository_id, pull_request_id, project):
+        return [SimpleNamespace(id=i, source_ref_commit=SimpleNamespace(commit_id=commit))
+                for i, commit in self.commits.items()]
+
+    def get_pull_request_iteration_changes(self, repository_id, pull_request_id, iteration_id, project):
+        self.changes_requested.append(iteration_id)
+        entries = [SimpleNamespace(item=SimpleNamespace(path=path), change_type='edit') for path in self.paths]
+        entries.append(SimpleNamespace(item=SimpleNamespace(path='/gone.py'), change_type='delete'))
+        return SimpleNamespace(change_entries=entries)
+
+
+@pytest.fixture
+def ado(monkeypatch, tmp_path):
+    """Point the PR cache at tmp_path and record downloads instead of calling Azure DevOps."""
+    state = SimpleNamespace(client=FakeGitClient({1: 'c1'}), downloads=[], cache_dir=tmp_path / 'ado-pr')
+
+    async def download_items(items_url, pat_token, file_paths, commit_id, folder, on_file=None):
+        state.downloads.append((list(file_paths), commit_id, folder))
+        for file_path in file_paths:
+            path = Path(folder) / file_path.lstrip('/')
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(commit_id * 100)
+            if on_file:
+                on_file(path, file_path.lstrip('/'), len(commit_id) * 100)
+        return len(commit_id) * 100 * len(file_paths)
+
+    monkeypatch.setattr(ado_service, 'PR_CACHE_DIR', state.cache_dir)
+    monkeypatch.setattr(ado_service, '_get_git_client', lambda organization, pat_token: state.client)
+    monkeypatch.setattr(ado_service, '_download_items', download_items)
+    return state
+
+
+def _download_pr(pr_id=1, use_cache=True, on_file=None):
+    return Path(asyncio.run(download_pr_changes_async(PR_URL.format(pr_id=pr_id), 'pat', use_cache, on_file)))
+
+
+def _age(path: Path, seconds: float):
+    stamp = time.time() - seconds
+    os.utime(path, (stamp, stamp))
+
+
+def test_latest_iteration_is_downloaded_at_its_source_commit(ado):
+    ado.client = FakeGitClient({1: 'c1', 3: 'c3', 2: 'c2'})
+
+    folder = _download_pr()
+
+    assert ado.client.changes_requested == [3]
+    assert ado.downloads == [(['/a.py', '/src/b.py'], 'c3', str(folder))]
+    assert (folder / 'src' / 'b.py').read_text() == 'c3' * 100
+
+
+def test_cached_pr_is_reused_and_marked_as_used(ado):
+    first = _download_pr()
+    marker = first / COMPLETE_MARKER
+    _age(marker, 1000)
+
+    second = _download_pr()
+
+    assert second == first
+    assert len(ado.downloads) == 1
+    assert time.time() - marker.stat().st_mtime < 100
+
+
+def test_cached_pr_reports_its_files(ado):
+    folder = _download_pr()
+    reported = []
+
+    _download_pr(on_file=lambda path, name, size: reported.append((path, name, size)))
+
+    assert len(ado.downloads) == 1
+    assert sorted(reported) == [(folder / 'a.py', 'a.py', 200), (folder / 'src' / 'b.py', 'src/b.py', 200)]
+
+
+def test_new_iteration_is_downloaded_again(ado):
+    first = _download_pr()
+    ado.client = FakeGitClient({1: 'c1', 2: 'c2'})
+
+    second = _download_pr()
+
+    assert second != first
+    assert len(ado.downloads) == 2
+
+
+def test_no_cache_downloads_outside_the_cache(ado):
+    folder = _download_pr(use_cache=False)
+
+    assert ado.cache_dir not in folder.parents
+    assert not ado.cache_dir.exists()
+
+
+def test_stale_incomplete_download_is_replaced(ado):
+    folder = _download_pr()
+    (folder / COMPLETE_MARKER).unlink()
+    _age(folder, ado_service.STALE_DOWNLOAD_SECONDS + 1)
+
+    again = _download_pr()
+
+    assert again == folder
+    assert (folder / COMPLETE_MARKER).exists()
+
+
+def test_download_in_progress_elsewhere_uses_a_temporary_folder(ado):
+    folder = _download_pr()
+    (folder / COMPLETE_MARKER).unlink()
+
+    other = _download_pr()
+
+    assert ado.cache_dir not in other.parents
+    assert not (folder / COMPLETE_MARKER).exists()
+
+
+def test_least_recently_used_prs_are_pruned(ado, monkeypatch):
+    # Each download is 2 files of 200 bytes; room for two PRs
+    monkeypatch.setattr(ado_service, 'PR_CACHE_SIZE_LIMIT', 800)
+    first = _download_pr(pr_id=1)
+    _age(first / COMPLETE_MARKER, 300)
+    second = _download_pr(pr_id=2)
+    _age(second / COMPLETE_MARKER, 200)
+    # Using the first PR again makes the second the least recently used
+    assert _download_pr(pr_id=1) == first
+
+    third = _download_pr(pr_id=3)
+
+    assert first.exists() and third.exists()
+    assert not second.exists()
+
+
+def test_stale_leftovers_are_removed_when_pruning(ado):
+    leftover = ado.cache_dir / '.download-abc123'
+    (leftover / 'src').mkdir(parents=True)
+    _age(leftover, ado_service.STALE_DOWNLOAD_SECONDS + 1)
+    recent = ado.cache_dir / 'in-progress'
+    recent.mkdir()
+
+    _download_pr()
+
+    assert not leftover.exists()
+    assert recent.exists()
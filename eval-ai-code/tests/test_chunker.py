@@ -0,0 +1,47 @@
+import random
+
+from services.Chunker import MAX_CHUNK_SIZE, chunk_content
+
+
+def _source(lines=2000, seed=0):
+    rng = random.Random(seed)
+    return "".join(f"value_{i} = compute({rng.randint(0, 10**6)})  # step {i}\n" for i in range(lines))
+
+
+def test_chunks_round_trip():
+    content = _source()
+
+    assert "".join(chunk_content(content)) == content
+
+
+def test_chunks_respect_max_size():
+    chunks = chunk_content(_source())
+
+    assert len(chunks) > 1
+    assert all(len(chunk) <= MAX_CHUNK_SIZE for chunk in chunks)
+
+
+def test_long_lines_are_hard_split():
+    content = "a" * 50000 + "\nshort line\n" + "b" * 20000
+
+    chunks = chunk_content(content)
+
+    assert "".join(chunks) == content
+    assert all(len(chunk) <= MAX_CHUNK_SIZE for chunk in chunks)
+
+
+def test_edit_only_changes_the_chunk_around_it():
+    content = _source()
+    lines = content.splitlines(keepends=True)
+    lines[1000] = "value_1000 = compute(42)  # edited\n"
+
+    before = chunk_content(content)
+    after = chunk_content("".join(lines))
+
+    changed = set(after) - set(before)
+    assert len(changed) <= 1
+    assert len(set(before) - set(after)) <= 1
+
+
+def test_empty_content_has_no_chunks():
+    assert chunk_content("") == []
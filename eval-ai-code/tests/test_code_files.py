@@ -0,0 +1,77 @@
+from pathlib import Path
+
+
+def _write(path: Path, content: str = "x = 1\n"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content)
+
+
+def _names(files, root: Path):
+    return sorted(str(path.relative_to(root)) for path, _ in files)
+
+
+def test_hidden_and_excluded_folders_are_pruned(evaluator, tmp_path):
+    _write(tmp_path / "app.py")
+    _write(tmp_path / "src" / "lib.js")
+    _write(tmp_path / ".git" / "hooks" / "hook.py")
+    _write(tmp_path / ".hidden" / "tool.py")
+    _write(tmp_path / "node_modules" / "pkg" / "index.js")
+    _write(tmp_path / "src" / "__pycache__" / "lib.py")
+    _write(tmp_path / "docs" / "conf.py")
+
+    files = evaluator.get_code_files(tmp_path, exclude_folders={"docs"})
+
+    assert _names(files, tmp_path) == ["app.py", str(Path("src") / "lib.js")]
+
+
+def test_hidden_empty_and_non_code_files_are_skipped(evaluator, tmp_path):
+    _write(tmp_path / "main.PY")
+    _write(tmp_path / ".eslintrc.js")
+    _write(tmp_path / "empty.py", "")
+    _write(tmp_path / "notes.txt")
+    _write(tmp_path / "Makefile")
+
+    files = evaluator.get_code_files(tmp_path)
+
+    assert _names(files, tmp_path) == ["main.PY"]
+
+
+def test_excluded_extensions_are_skipped(evaluator, tmp_path):
+    _write(tmp_path / "a.py")
+    _write(tmp_path / "b.js")
+
+    files = evaluator.get_code_files(tmp_path, exclude_extensions={".js"})
+
+    assert _names(files, tmp_path) == ["a.py"]
+
+
+def test_root_inside_a_hidden_folder_is_scanned(evaluator, tmp_path):
+    root = tmp_path / ".cache" / "ado-pr" / "abc123"
+    _write(root / "service.py")
+    _write(root / "nested" / "util.ts")
+
+    files = evaluator.get_code_files(root)
+
+    assert _names(files, root) == [str(Path("nested") / "util.ts"), "service.py"]
+
+
+def test_sizes_come_from_the_scan(evaluator, tmp_path):
+    _write(tmp_path / "a.py", "x = 1\n")
+    _write(tmp_path / "b.py", "y = 2\n" * 100)
+
+    files = dict(evaluator.get_code_files(tmp_path))
+
+    assert files == {tmp_path / "a.py": 6, tmp_path / "b.py": 600}
+
+
+def test_streamed_files_use_the_scan_filters(evaluator):
+    assert evaluator.should_evaluate("src/lib.js", 10)
+    assert evaluator.should_evaluate("main.PY", 10)
+    assert not evaluator.should_evaluate("empty.py", 0)
+    assert not evaluator.should_evaluate("notes.txt", 10)
+    assert not evaluator.should_evaluate("Makefile", 10)
+    assert not evaluator.should_evaluate(".eslintrc.js", 10)
+    assert not evaluator.should_evaluate(".github/scripts/release.py", 10)
+    assert not evaluator.should_evaluate("node_modules/pkg/index.js", 10)
+    assert not evaluator.should_evaluate("docs/conf.py", 10, exclude_folders={"docs"})
+    assert not evaluator.should_evaluate("b.js", 10, exclude_extensions={".js"})
@@ -0,0 +1,87 @@
+import asyncio
+from pathlib import Path
+
+DEPLOYMENT = "test-deployment"
+
+
+class FakeScorer:
+    """Stands in for AICodeEvaluator._score_file and _score_files, recording each request."""
+
+    def __init__(self):
+        self.requests = []
+
+    async def score_file(self, file_path, filename, deployment_name):
+        self.requests.append([filename])
+        return 9, f"single {filename}"
+
+    async def score_files(self, file_paths, filenames, deployment_name):
+        self.requests.append(list(filenames))
+        return [(2, f"batched {filename}") for filename in filenames]
+
+
+def _scorer(evaluator):
+    scorer = FakeScorer()
+    evaluator._score_file = scorer.score_file
+    evaluator._score_files = scorer.score_files
+    return scorer
+
+
+def _item(name, size):
+    return Path(name), name, size
+
+
+def test_small_files_are_batched_and_large_ones_sent_alone(evaluator):
+    scorer = _scorer(evaluator)
+    small = [_item(f"s{i}.py", 10) for i in range(evaluator.BATCH_SIZE + 1)]
+
+    async def run():
+        files = asyncio.Queue()
+        for item in [*small[:3], _item("big.py", evaluator.SMALL_FILE_BYTES), *small[3:], None]:
+            files.put_nowait(item)
+        return await evaluator.evaluate_files(files, DEPLOYMENT, concurrency=2)
+
+    evaluation = asyncio.run(run())
+
+    assert sorted(scorer.requests) == sorted([["big.py"], [name for _, name, _ in small[:evaluator.BATCH_SIZE]], ["s8.py"]])
+    assert evaluation.total_files == evaluator.BATCH_SIZE + 2
+    reasons = {result.filename: result.reason for result in evaluation.file_evaluations}
+    assert reasons["big.py"] == "single big.py"
+    assert reasons["s0.py"] == "batched s0.py"
+    # The leftover small file is alone, so it needs no batch prompt
+    assert reasons["s8.py"] == "single s8.py"
+
+
+def test_files_are_evaluated_while_more_are_arriving(evaluator):
+    scorer = _scorer(evaluator)
+
+    async def run():
+        files = asyncio.Queue()
+        evaluation = asyncio.create_task(evaluator.evaluate_files(files, DEPLOYMENT))
+        files.put_nowait(_item("first.py", evaluator.SMALL_FILE_BYTES))
+        # Give the workers a chance to pick up the first file before the stream ends
+        for _ in range(10):
+            await asyncio.sleep(0)
+        requested_before_end = list(scorer.requests)
+        files.put_nowait(_item("second.py", evaluator.SMALL_FILE_BYTES))
+        files.put_nowait(None)
+        return requested_before_end, await evaluation
+
+    requested_before_end, evaluation = asyncio.run(run())
+
+    assert requested_before_end == [["first.py"]]
+    assert evaluation.total_files == 2
+    assert evaluation.score == 9
+
+
+def test_empty_stream_has_no_files(evaluator):
+    scorer = _scorer(evaluator)
+
+    async def run():
+        files = asyncio.Queue()
+        files.put_nowait(None)
+        return await evaluator.evaluate_files(files, DEPLOYMENT)
+
+    evaluation = asyncio.run(run())
+
+    assert evaluation.total_files == 0
+    assert scorer.requests == []
@@ -0,0 +1,105 @@
+import asyncio
+import json
+
+import pytest
+
+from services.EvaluationCache import EvaluationCache
+
+DEPLOYMENT = "test-deployment"
+
+
+class FakeModel:
+    """Stands in for AICodeEvaluator._complete and answers with a fixed batch result."""
+
+    def __init__(self, files=None, error=None):
+        self.files = files or []
+        self.error = error
+        self.prompts = []
+
+    async def __call__(self, deployment_name, user_content, **options):
+        self.prompts.append(user_content)
+        if self.error:
+            raise self.error
+        return json.dumps({"files": self.files})
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = EvaluationCache(tmp_path / "cache")
+    yield cache
+    cache.close()
+
+
+def _snippets(*names):
+    return [(name, ".py", f"# {name}\nvalue = '{name}'\n") for name in names]
+
+
+def test_answers_are_matched_by_index(evaluator):
+    evaluator._complete = FakeModel([
+        {"index": 3, "score": 3, "reason": "third"},
+        {"index": 1, "score": 1, "reason": "first"},
+        {"index": 2, "score": 42, "reason": "second"},
+    ])
+
+    results = asyncio.run(evaluator._evaluate_snippets(_snippets("a.py", "b.py", "c.py"), DEPLOYMENT))
+
+    assert results == [(1, "first"), (10, "second"), (3, "third")]
+    assert "=== FILE 1: a.py ===" in evaluator._complete.prompts[0]
+    assert "=== FILE 3: c.py ===" in evaluator._complete.prompts[0]
+
+
+def test_missing_index_gets_a_neutral_score(evaluator):
+    evaluator._complete = FakeModel([{"index": 2, "score": 8, "reason": "second"}])
+
+    results = asyncio.run(evaluator._evaluate_snippets(_snippets("a.py", "b.py"), DEPLOYMENT))
+
+    assert results == [(5, "No evaluation returned for this file"), (8, "second")]
+
+
+def test_duplicate_index_keeps_the_first_answer(evaluator):
+    evaluator._complete = FakeModel([
+        {"index": 1, "score": 9, "reason": "first answer"},
+        {"index": 1, "score": 2, "reason": "second answer"},
+        {"index": 2, "score": 4, "reason": "other file"},
+        {"index": 7, "score": 6, "reason": "no such file"},
+    ])
+
+    results = asyncio.run(evaluator._evaluate_snippets(_snippets("a.py", "b.py"), DEPLOYMENT))
+
+    assert results == [(9, "first answer"), (4, "other file")]
+
+
+def test_request_error_scores_every_pending_snippet(evaluator):
+    evaluator._complete = FakeModel(error=RuntimeError("boom"))
+
+    results = asyncio.run(evaluator._evaluate_snippets(_snippets("a.py", "b.py"), DEPLOYMENT))
+
+    assert results == [(5, "Error during evaluation: boom")] * 2
+
+
+def test_all_cached_snippets_skip_the_request(evaluator, cache):
+    evaluator.cache = cache
+    snippets = _snippets("a.py", "b.py")
+    for score, (_, _, content) in zip((3, 7), snippets):
+        cache.set(evaluator._cache_key(content, DEPLOYMENT), score, "cached")
+    evaluator._complete = FakeModel()
+
+    results = asyncio.run(evaluator._evaluate_snippets(snippets, DEPLOYMENT))
+
+    assert results == [(3, "cached"), (7, "cached")]
+    assert evaluator._complete.prompts == []
+
+
+def test_only_uncached_snippets_are_sent_and_cached(evaluator, cache):
+    evaluator.cache = cache
+    snippets = _snippets("a.py", "b.py")
+    cache.set(evaluator._cache_key(snippets[0][2], DEPLOYMENT), 3, "cached")
+    evaluator._complete = FakeModel([{"index": 1, "score": 8, "reason": "fresh"}])
+
+    results = asyncio.run(evaluator._evaluate_snippets(snippets, DEPLOYMENT))
+
+    assert results == [(3, "cached"), (8, "fresh")]
+    # The uncached snippet is renumbered as the only block of the request
+    assert "=== FILE 1: b.py ===" in evaluator._complete.prompts[0]
+    assert "a.py" not in evaluator._complete.prompts[0]
+    assert cache.get(evaluator._cache_key(snippets[1][2], DEPLOYMENT)) == (8, "fresh")
@@ -0,0 +1,93 @@
+import pytest
+
+from services.HeuristicFilter import extract_features, heuristic_evaluation
+
+
+def _lines(*lines, repeat=1):
+    return "\n".join(list(lines) * repeat) + "\n"
+
+
+def test_preprocessor_directives_are_not_comments():
+    content = _lines("#include <stdio.h>", "#define SIZE 16", "#pragma once", repeat=4) + _lines("int x = 0;", repeat=10)
+
+    features = extract_features(content, ".c")
+
+    assert features['comment_ratio'] == 0
+    assert heuristic_evaluation(content, ".c") is None
+
+
+def test_c_header_is_left_to_the_model():
+    content = _lines("#ifndef UTIL_H", "#define UTIL_H", "int add(int a, int b);", "#endif", repeat=6)
+
+    assert heuristic_evaluation(content, ".h") is None
+
+
+def test_sql_banner_file_is_left_to_the_model():
+    content = _lines("-- ----------------------------", "-- Table structure", "-- ----------------------------",
+                     "CREATE TABLE t (id INT);", repeat=6)
+
+    assert heuristic_evaluation(content, ".sql") is None
+
+
+def test_separator_banners_are_not_comments():
+    content = _lines("# ------------------------------", "x = 1", repeat=12)
+
+    assert extract_features(content, ".py")['comment_ratio'] == 0
+
+
+def test_heavily_documented_python_scores_as_ai():
+    content = _lines(
+        "def add(a, b):",
+        '    """Add two numbers and return the result."""',
+        "    # Compute the sum of both operands",
+        "    # Python ints never overflow, so no bounds check is needed",
+        "    # Return the sum to the caller",
+        "    return a + b",
+        repeat=6,
+    )
+
+    score, reason = heuristic_evaluation(content, ".py")
+
+    assert score == 9
+    assert reason.startswith("Heuristic pre-filter")
+
+
+def test_human_looking_files_are_left_to_the_model():
+    content = _lines("def f(x):  ", "\treturn x", "def g(y):", "    return y ", repeat=6)
+
+    assert heuristic_evaluation(content, ".py") is None
+
+
+def test_uncommented_file_is_left_to_the_model():
+    content = _lines("x = 1", repeat=37) + _lines("y = 2 ", repeat=3)
+
+    assert heuristic_evaluation(content, ".py") is None
+
+
+def test_dereferences_are_not_comments():
+    content = _lines("void reset(int *p) {", "    *p = 0;", "    *(p + 1) = 0;", "}", repeat=6)
+
+    assert extract_features(content, ".c")['comment_ratio'] == 0
+
+
+def test_block_comment_lines_are_comments():
+    content = _lines("/*", " * Adds two numbers", " and returns the sum.", " */", "int add(int a, int b);", repeat=5)
+
+    # Every line but the declaration is inside a block; the bare '/*' and '*/' lines carry no text
+    assert extract_features(content, ".c")['comment_ratio'] == pytest.approx(2 / 5)
+
+
+def test_single_line_block_comment_closes():
+    content = _lines("/* counter */", "*p = 1;", repeat=10)
+
+    assert extract_features(content, ".c")['comment_ratio'] == pytest.approx(0.5)
+
+
+def test_block_comment_continuations_are_not_indentation():
+    content = _lines("/**", " * Adds two numbers.", " */", "int add(int a, int b) {", "\treturn a + b;", "}", repeat=4)
+
+    assert extract_features(content, ".c")['mixed_indentation'] == 0
+
+
+def test_short_file_is_left_to_the_model():
+    assert heuristic_evaluation(_lines("# comment", "x = 1", repeat=3), ".py") is None
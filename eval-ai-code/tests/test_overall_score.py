@@ -0,0 +1,40 @@
+from services.CodeEvaluatorService import EvaluationBatch, FileEvaluation, OverallEvaluation
+
+
+def _evaluations(*scores):
+    return [FileEvaluation(f"f{i}.py", score, "reason", ".py") for i, score in enumerate(scores)]
+
+
+def test_scores_are_averaged_and_banded(evaluator):
+    result = evaluator.calculate_overall_score(_evaluations(1, 3, 4, 6, 7, 10))
+
+    assert result.score == 5
+    assert result.total_files == 6
+    assert result.reason == "Mixed results: 2 likely AI-generated, 2 uncertain, 2 likely human-written"
+
+
+def test_only_filled_slots_are_counted(evaluator):
+    batch = EvaluationBatch(10)
+    for evaluation in _evaluations(9, 8, 10):
+        batch.add(evaluation)
+
+    result = evaluator.calculate_overall_score(batch)
+
+    assert result.score == 9
+    assert result.reason == "Most files (3/3) show strong indicators of AI generation"
+
+
+def test_no_files(evaluator):
+    result = evaluator.calculate_overall_score(EvaluationBatch())
+
+    assert result.total_files == 0
+    assert result.reason == "No code files found to evaluate"
+
+
+def test_overall_evaluation_accepts_file_evaluations():
+    evaluations = _evaluations(2, 9)
+
+    result = OverallEvaluation(score=6, reason="reason", total_files=2, file_evaluations=evaluations)
+
+    assert result.file_evaluations == evaluations
+    assert list(result.results.scores) == [2, 9]
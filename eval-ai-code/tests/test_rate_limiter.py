@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+
+from services import RateLimiter as rate_limiter_module
+from services.RateLimiter import RateLimiter, TokenBucket
+
+
+class FakeClock:
+    """Monotonic clock that only moves when the code under test sleeps."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter_module.time, 'monotonic', clock.monotonic)
+    monkeypatch.setattr(rate_limiter_module.asyncio, 'sleep', clock.sleep)
+    return clock
+
+
+def test_bucket_starts_full(clock):
+    bucket = TokenBucket(60)
+
+    asyncio.run(bucket.acquire(60))
+
+    assert clock.sleeps == []
+    assert bucket.level == 0
+
+
+def test_bucket_waits_for_the_deficit(clock):
+    bucket = TokenBucket(60)
+
+    async def run():
+        await bucket.acquire(60)
+        await bucket.acquire(10)
+
+    asyncio.run(run())
+
+    # 60 per minute refills one unit per second
+    assert clock.sleeps == [pytest.approx(10)]
+
+
+def test_refill_is_clamped_to_capacity(clock):
+    bucket = TokenBucket(60)
+
+    async def run():
+        await bucket.acquire(60)
+        clock.now += 1000
+        await bucket.acquire(60)
+        await bucket.acquire(1)
+
+    asyncio.run(run())
+
+    assert clock.sleeps == [pytest.approx(1)]
+
+
+def test_request_larger_than_capacity_is_clamped(clock):
+    bucket = TokenBucket(60)
+
+    asyncio.run(bucket.acquire(1000))
+
+    assert clock.sleeps == []
+    assert bucket.level == 0
+
+
+def test_pause_holds_back_the_next_request(clock):
+    limiter = RateLimiter()
+    limiter.pause(5)
+
+    asyncio.run(limiter.acquire(100))
+
+    assert clock.sleeps == [pytest.approx(5)]
+
+
+def test_pause_keeps_the_later_deadline(clock):
+    limiter = RateLimiter()
+    limiter.pause(10)
+    limiter.pause(2)
+
+    asyncio.run(limiter.acquire(100))
+
+    assert clock.sleeps == [pytest.approx(10)]
+
+
+def test_limiter_enforces_both_quotas(clock):
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=600)
+
+    async def run():
+        await limiter.acquire(600)
+        await limiter.acquire(20)
+
+    asyncio.run(run())
+
+    # The request bucket still has room; the token bucket needs 2 s to refill 20 tokens
+    assert clock.sleeps == [pytest.approx(2)]
+
+
+def test_unset_quotas_are_not_enforced(clock):
+    limiter = RateLimiter()
+
+    async def run():
+        for _ in range(1000):
+            await limiter.acquire(10**6)
+
+    asyncio.run(run())
+
+    assert clock.sleeps == []